@@ -2,515 +2,764 @@
 """
 Vercel serverless function handler for PubMed MCP HTTP-streamable server.
 
-This module provides a simple HTTP handler that implements the MCP protocol
+This module provides a small ASGI application that implements the MCP protocol
 for PubMed database searches using NCBI E-utilities API.
 """
 
+import asyncio
 import json
-import urllib.request
-import urllib.parse
-from http.server import BaseHTTPRequestHandler
+import os
+import random
+import re
+import time
+from collections import OrderedDict
+from urllib.parse import quote_plus, urlencode
+
+import httpx
+from starlette.applications import Starlette
+from starlette.endpoints import HTTPEndpoint
+from starlette.middleware import Middleware
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Route
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+EUTILS_BASE_URL = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils"
+
+# Maximum number of PubMed IDs requested from EFetch in a single call
+EFETCH_BATCH_SIZE = 200
+
+# Sent with every E-utilities request. NCBI asks clients to identify
+# themselves, and an API key raises the rate limit from 3 to 10 requests/s.
+NCBI_API_KEY = os.getenv("NCBI_API_KEY")
+NCBI_EMAIL = os.getenv("NCBI_EMAIL")
+
+_NCBI_IDENTITY = {"tool": "pubmedmcp", "email": NCBI_EMAIL, "api_key": NCBI_API_KEY}
+
+# E-utilities URLs with every constant parameter already encoded, so only the
+# per-request values are quoted and appended
+ESEARCH_URL = f"{EUTILS_BASE_URL}/esearch.fcgi?" + urlencode(
+    {
+        **{k: v for k, v in _NCBI_IDENTITY.items() if v},
+        "db": "pubmed",
+        "retmode": "json",
+        "usehistory": "y",
+    }
+)
+EFETCH_URL = f"{EUTILS_BASE_URL}/efetch.fcgi?" + urlencode(
+    {
+        **{k: v for k, v in _NCBI_IDENTITY.items() if v},
+        "db": "pubmed",
+        "retmode": "text",
+        "rettype": "abstract",
+    }
+)
+
+# Optional ESearch parameters, only sent when given a non-empty value
+ESEARCH_OPTIONAL_PARAMS = ("sort", "field", "datetype", "reldate", "mindate", "maxdate")
+
+_IDLIST_RE = re.compile(rb'"idlist"\s*:\s*\[([^\]]*)\]')
+_ID_RE = re.compile(r'"(\d+)"')
+
+# Pooled NCBI connections, shared by every search running on the same event
+# loop. The client and the semaphore guarding it are bound to the loop that
+# created them, so there is one pair per loop; they outlive a single request
+# wherever the host keeps its loop between requests.
+_loop_clients = {}
+_ncbi_next_request = 0.0
+
+# NCBI allows 3 requests per second per IP without an API key and 10 with one.
+# Requests are spaced out to stay under that rate, and the number in flight is
+# capped at the same figure so a slow response cannot pile up a burst behind
+# it. Rate-limited (429) and server error responses are retried with
+# exponential backoff and jitter instead of being surfaced straight away.
+NCBI_RATE_LIMIT = 10.0 if NCBI_API_KEY else 3.0
+NCBI_MAX_CONCURRENCY = 10 if NCBI_API_KEY else 3
+NCBI_MAX_ATTEMPTS = 3
+NCBI_RETRY_BACKOFF = 0.2
+
+# Successful searches are kept in memory so repeated queries skip both NCBI
+# round trips. PubMed results change over time, hence the expiry.
+SEARCH_CACHE_SIZE = 512
+SEARCH_CACHE_TTL = 600.0
+_search_cache = OrderedDict()
+
+# orjson works on bytes directly, avoiding the str <-> UTF-8 round trip. The
+# stdlib fallback keeps the handler importable where the wheel is unavailable.
+if orjson is not None:
+    _dumps = orjson.dumps
+    _loads = orjson.loads
+else:
+
+    def _dumps(obj):
+        return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode(
+            "utf-8"
+        )
 
+    _loads = json.loads
+
+
+def _dumps_indented(obj):
+    """Serialize obj to an indented JSON string for embedding in text content"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode("utf-8")
+    return json.dumps(obj, indent=2, ensure_ascii=False)
+
+
+def _get_client():
+    """Return the async HTTP client and semaphore of the running loop, creating
+    them on first use"""
+    loop = asyncio.get_running_loop()
+    state = _loop_clients.get(loop)
+    if state is None:
+        # Loops that are no longer running have nothing in flight, so their
+        # entries are dropped rather than kept for the life of the process.
+        # Their clients cannot be closed without a loop, and their sockets are
+        # released when they are garbage collected.
+        for other in list(_loop_clients):
+            if not other.is_running():
+                _loop_clients.pop(other, None)
+        state = _loop_clients[loop] = (
+            httpx.AsyncClient(
+                timeout=httpx.Timeout(15.0),
+                limits=httpx.Limits(
+                    max_connections=64,
+                    max_keepalive_connections=10,
+                    keepalive_expiry=60.0,
+                ),
+            ),
+            asyncio.Semaphore(NCBI_MAX_CONCURRENCY),
+        )
+    return state
+
+
+# Static MCP payloads. Everything below is constant for the lifetime of the
+# process, so it is serialized once at import and only the echoed request id
+# is spliced in per request.
+SERVER_INFO = {
+    "name": "PubMed MCP Server",
+    "version": "1.0.0",
+    "description": "HTTP-streamable MCP server for PubMed database searches",
+}
+
+TOOLS = [
+    {
+        "name": "search_abstracts",
+        "description": "Search abstracts on PubMed database based on the request parameters. Returns formatted text containing article titles, abstracts, authors, journal names, publication dates, DOIs, and PMIDs.",
+        "inputSchema": {
+            "type": "object",
+            "required": ["term"],
+            "properties": {
+                "term": {
+                    "type": "string",
+                    "description": "Entrez text query. All special characters must be URL encoded. Spaces may be replaced by '+' signs.",
+                },
+                "retmax": {
+                    "type": "integer",
+                    "description": "Number of UIDs to return (default=20, max=10000).",
+                    "default": 20,
+                },
+                "sort": {
+                    "type": "string",
+                    "description": "Sort method for results. Options: pub_date, Author, JournalName, relevance",
+                    "enum": ["pub_date", "Author", "JournalName", "relevance"],
+                },
+                "field": {
+                    "type": "string",
+                    "description": "Search field to limit entire search. Equivalent to adding [field] to term.",
+                },
+                "datetype": {
+                    "type": "string",
+                    "description": "Type of date used to limit search: mdat (modification date), pdat (publication date), edat (Entrez date)",
+                    "enum": ["mdat", "pdat", "edat"],
+                },
+                "reldate": {
+                    "type": "integer",
+                    "description": "When set to n, returns items with datetype within the last n days.",
+                },
+                "mindate": {
+                    "type": "string",
+                    "description": "Start date for date range. Format: YYYY/MM/DD, YYYY/MM, or YYYY. Must be used with maxdate.",
+                },
+                "maxdate": {
+                    "type": "string",
+                    "description": "End date for date range. Format: YYYY/MM/DD, YYYY/MM, or YYYY. Must be used with mindate.",
+                },
+            },
+        },
+    }
+]
+
+RESOURCES = [
+    {
+        "uri": "config://server",
+        "name": "Server Configuration",
+        "description": "PubMed MCP server configuration and status information",
+        "mimeType": "application/json",
+    },
+    {
+        "uri": "help://pubmed",
+        "name": "PubMed Search Help",
+        "description": "Documentation for PubMed search parameters and usage",
+        "mimeType": "text/plain",
+    },
+]
+
+RESOURCE_TEMPLATES = [
+    {
+        "uri": "template://pubmed-search",
+        "name": "PubMed Search Template",
+        "description": "Template for common PubMed search patterns",
+        "mimeType": "application/json",
+    },
+    {
+        "uri": "template://recent-articles",
+        "name": "Recent Articles Template",
+        "description": "Template for finding recent articles on a topic",
+        "mimeType": "application/json",
+    },
+]
+
+SERVER_CONFIG = {
+    **SERVER_INFO,
+    "capabilities": {
+        "tools": ["search_abstracts"],
+        "resources": ["config://server", "help://pubmed"],
+    },
+    "environment": "vercel",
+    "features": ["pubmed_search", "abstract_retrieval", "ncbi_api"],
+}
+
+HELP_TEXT = """PubMed MCP Server - Search Help
 
-class handler(BaseHTTPRequestHandler):
-    """HTTP request handler for PubMed MCP server on Vercel."""
+Available Tools:
+- search_abstracts: Search PubMed database for research abstracts
 
-    def do_GET(self):
-        """Handle GET requests"""
-        try:
-            self.send_response(200)
-            self.send_header("Content-Type", "application/json")
-            self.send_header("Access-Control-Allow-Origin", "*")
-            self.end_headers()
-
-            response = {
-                "name": "PubMed MCP Server",
-                "version": "1.0.0",
-                "status": "running",
-                "tools": 1,
-                "description": "PubMed search MCP server for Vercel",
-            }
-            self.wfile.write(json.dumps(response).encode("utf-8"))
+Search Parameters:
+- term (required): Search query string
+- retmax (optional): Number of results to return (default: 20, max: 10000)
+- sort (optional): Sort method - pub_date, Author, JournalName, relevance
+- field (optional): Search field to limit entire search
+- datetype (optional): Date type - mdat, pdat, edat
+- reldate (optional): Return items from last N days
+- mindate (optional): Start date (YYYY/MM/DD format)
+- maxdate (optional): End date (YYYY/MM/DD format)
+
+Examples:
+- Search for "cancer" articles: {"term": "cancer"}
+- Recent articles: {"term": "diabetes", "reldate": 30}
+- Date range: {"term": "covid", "mindate": "2023/01/01", "maxdate": "2023/12/31"}
+- Sort by date: {"term": "machine learning", "sort": "pub_date"}
+
+The server uses NCBI E-utilities API for PubMed searches."""
+
+PUBMED_SEARCH_TEMPLATE = {
+    "name": "PubMed Search Template",
+    "description": "Template for common PubMed search patterns",
+    "arguments": {
+        "term": {
+            "type": "string",
+            "description": "Search term for PubMed",
+            "required": True,
+        },
+        "retmax": {
+            "type": "integer",
+            "description": "Number of results (default: 20)",
+            "default": 20,
+        },
+        "sort": {
+            "type": "string",
+            "description": "Sort method",
+            "enum": ["pub_date", "Author", "JournalName", "relevance"],
+            "default": "relevance",
+        },
+    },
+    "examples": [
+        {
+            "name": "Basic Search",
+            "arguments": {"term": "cancer treatment", "retmax": 10},
+        },
+        {
+            "name": "Recent Articles",
+            "arguments": {
+                "term": "machine learning",
+                "sort": "pub_date",
+                "retmax": 5,
+            },
+        },
+    ],
+}
+
+RECENT_ARTICLES_TEMPLATE = {
+    "name": "Recent Articles Template",
+    "description": "Template for finding recent articles on a topic",
+    "arguments": {
+        "term": {
+            "type": "string",
+            "description": "Search term for recent articles",
+            "required": True,
+        },
+        "reldate": {
+            "type": "integer",
+            "description": "Days back to search (default: 30)",
+            "default": 30,
+        },
+        "retmax": {
+            "type": "integer",
+            "description": "Number of results (default: 10)",
+            "default": 10,
+        },
+    },
+    "examples": [
+        {
+            "name": "Last 7 Days",
+            "arguments": {"term": "covid-19", "reldate": 7, "retmax": 5},
+        },
+        {
+            "name": "Last Month",
+            "arguments": {
+                "term": "artificial intelligence",
+                "reldate": 30,
+                "retmax": 20,
+            },
+        },
+    ],
+}
+
+
+def _result_tail(result):
+    """Serialize everything after the id of a JSON-RPC success response"""
+    return b',"result":' + _dumps(result) + b"}"
 
-        except Exception as e:
-            self.send_response(500)
-            self.send_header("Content-Type", "application/json")
-            self.end_headers()
-            error_response = {"error": str(e)}
-            self.wfile.write(json.dumps(error_response).encode("utf-8"))
 
-    def do_POST(self):
+def _resource_tail(uri, mime_type, text):
+    """Serialize the response tail of a resources/read call for a fixed URI"""
+    return _result_tail(
+        {"contents": [{"uri": uri, "mimeType": mime_type, "text": text}]}
+    )
+
+
+_RESPONSE_HEAD = b'{"jsonrpc":"2.0","id":'
+
+# Envelope around the text of a tools/call result, written around the
+# abstracts so they never pass through an intermediate response dict
+_TEXT_CONTENT_HEAD = b',"result":{"content":[{"type":"text","text":'
+_TEXT_CONTENT_TAIL = b"}]}}"
+
+_STATIC_RESULTS = {
+    "initialize": _result_tail(
+        {
+            "protocolVersion": "2024-11-05",
+            "capabilities": {"tools": {}, "resources": {}},
+            "serverInfo": SERVER_INFO,
+        }
+    ),
+    "ping": _result_tail({}),
+    "tools/list": _result_tail({"tools": TOOLS}),
+    "resources/list": _result_tail({"resources": RESOURCES}),
+    "resources/templates/list": _result_tail({"templates": RESOURCE_TEMPLATES}),
+}
+
+_STATIC_RESOURCES = {
+    "config://server": _resource_tail(
+        "config://server", "application/json", _dumps_indented(SERVER_CONFIG)
+    ),
+    "help://pubmed": _resource_tail("help://pubmed", "text/plain", HELP_TEXT),
+    "template://pubmed-search": _resource_tail(
+        "template://pubmed-search",
+        "application/json",
+        _dumps_indented(PUBMED_SEARCH_TEMPLATE),
+    ),
+    "template://recent-articles": _resource_tail(
+        "template://recent-articles",
+        "application/json",
+        _dumps_indented(RECENT_ARTICLES_TEMPLATE),
+    ),
+}
+
+
+def _static_response(request_id, tail):
+    """Splice the echoed request id into a pre-serialized response"""
+    return b"".join((_RESPONSE_HEAD, _dumps(request_id), tail))
+
+
+_CORS_HEADERS = {"Access-Control-Allow-Origin": "*"}
+_PREFLIGHT_HEADERS = {
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Methods": "GET, POST, OPTIONS",
+    "Access-Control-Allow-Headers": "Content-Type, Authorization, X-API-Key",
+}
+
+# Responses at least this large are gzip-compressed for clients that accept
+# it; smaller ones (ping, errors, ...) are not worth the CPU
+GZIP_MIN_SIZE = 1024
+
+# The GET status and CORS preflight responses never change. Starlette
+# responses are not mutated when sent, so a single instance of each (headers
+# and body already rendered) is shared by every request.
+_STATUS_RESPONSE = Response(
+    _dumps(
+        {
+            "name": "PubMed MCP Server",
+            "version": "1.0.0",
+            "status": "running",
+            "tools": 1,
+            "description": "PubMed search MCP server for Vercel",
+        }
+    ),
+    media_type="application/json",
+    headers=_CORS_HEADERS,
+)
+_PREFLIGHT_RESPONSE = Response(headers=_PREFLIGHT_HEADERS)
+
+
+class MCPEndpoint(HTTPEndpoint):
+    """HTTP endpoint for PubMed MCP server on Vercel."""
+
+    async def get(self, request):
+        """Handle GET requests"""
+        return _STATUS_RESPONSE
+
+    async def post(self, request):
         """Handle POST requests"""
         try:
             # Read request body
-            content_length = int(self.headers.get("Content-Length", 0))
-            post_data = self.rfile.read(content_length)
-
-            self.send_response(200)
-            self.send_header("Content-Type", "application/json")
-            self.send_header("Access-Control-Allow-Origin", "*")
-            self.end_headers()
+            post_data = await request.body()
 
             if post_data:
                 try:
-                    request_data = json.loads(post_data.decode("utf-8"))
-                    response = handle_mcp_request(request_data)
+                    request_data = _loads(post_data)
+                    body = await handle_mcp_request(request_data)
                 except json.JSONDecodeError as e:
-                    response = create_error_response(-32700, f"Parse error: {str(e)}")
+                    body = create_error_response(-32700, f"Parse error: {str(e)}")
                 except Exception as e:
-                    response = create_error_response(
-                        -32603, f"Internal error: {str(e)}"
-                    )
+                    body = create_error_response(-32603, f"Internal error: {str(e)}")
             else:
-                response = create_error_response(
+                body = create_error_response(
                     -32600, "Invalid Request: No data received"
                 )
 
-            self.wfile.write(json.dumps(response).encode("utf-8"))
+            if isinstance(body, bytes):
+                return Response(
+                    body, media_type="application/json", headers=_CORS_HEADERS
+                )
+            return StreamingResponse(
+                body, media_type="application/json", headers=_CORS_HEADERS
+            )
 
         except Exception as e:
-            self.send_response(500)
-            self.send_header("Content-Type", "application/json")
-            self.end_headers()
             error_response = {"error": str(e)}
-            self.wfile.write(json.dumps(error_response).encode("utf-8"))
+            return Response(
+                _dumps(error_response), status_code=500, media_type="application/json"
+            )
 
-    def do_OPTIONS(self):
+    async def options(self, request):
         """Handle CORS preflight requests"""
-        self.send_response(200)
-        self.send_header("Access-Control-Allow-Origin", "*")
-        self.send_header("Access-Control-Allow-Methods", "GET, POST, OPTIONS")
-        self.send_header(
-            "Access-Control-Allow-Headers", "Content-Type, Authorization, X-API-Key"
-        )
-        self.end_headers()
+        return _PREFLIGHT_RESPONSE
 
 
-def handle_mcp_request(request_data):
-    """Handle MCP protocol requests"""
-    # Validate request structure
-    if not isinstance(request_data, dict):
-        return {
-            "jsonrpc": "2.0",
-            "id": None,
-            "error": {"code": -32700, "message": "Parse error: Invalid JSON"},
-        }
+# ASGI entrypoint picked up by the Vercel Python runtime. Every path is routed
+# here by vercel.json, so the endpoint answers regardless of the request path.
+app = Starlette(
+    routes=[Route("/{path:path}", MCPEndpoint)],
+    middleware=[
+        Middleware(GZipMiddleware, minimum_size=GZIP_MIN_SIZE, compresslevel=6)
+    ],
+)
 
-    if "jsonrpc" not in request_data or request_data.get("jsonrpc") != "2.0":
-        return {
-            "jsonrpc": "2.0",
-            "id": request_data.get("id"),
-            "error": {
-                "code": -32600,
-                "message": "Invalid Request: Missing or invalid jsonrpc field",
-            },
-        }
 
-    method = request_data.get("method")
+def _static_handler(tail):
+    """Build a method handler that answers with a pre-serialized result"""
 
-    if method == "initialize":
-        return {
-            "jsonrpc": "2.0",
-            "id": request_data.get("id"),
-            "result": {
-                "protocolVersion": "2024-11-05",
-                "capabilities": {"tools": {}, "resources": {}},
-                "serverInfo": {
-                    "name": "PubMed MCP Server",
-                    "version": "1.0.0",
-                    "description": "HTTP-streamable MCP server for PubMed database searches",
-                },
-            },
-        }
+    async def handle(req_id, params):
+        return _static_response(req_id, tail)
 
-    elif method == "ping":
-        return {"jsonrpc": "2.0", "id": request_data.get("id"), "result": {}}
-
-    elif method == "tools/list":
-        tools = [
-            {
-                "name": "search_abstracts",
-                "description": "Search abstracts on PubMed database based on the request parameters. Returns formatted text containing article titles, abstracts, authors, journal names, publication dates, DOIs, and PMIDs.",
-                "inputSchema": {
-                    "type": "object",
-                    "required": ["term"],
-                    "properties": {
-                        "term": {
-                            "type": "string",
-                            "description": "Entrez text query. All special characters must be URL encoded. Spaces may be replaced by '+' signs.",
-                        },
-                        "retmax": {
-                            "type": "integer",
-                            "description": "Number of UIDs to return (default=20, max=10000).",
-                            "default": 20,
-                        },
-                        "sort": {
-                            "type": "string",
-                            "description": "Sort method for results. Options: pub_date, Author, JournalName, relevance",
-                            "enum": ["pub_date", "Author", "JournalName", "relevance"],
-                        },
-                        "field": {
-                            "type": "string",
-                            "description": "Search field to limit entire search. Equivalent to adding [field] to term.",
-                        },
-                        "datetype": {
-                            "type": "string",
-                            "description": "Type of date used to limit search: mdat (modification date), pdat (publication date), edat (Entrez date)",
-                            "enum": ["mdat", "pdat", "edat"],
-                        },
-                        "reldate": {
-                            "type": "integer",
-                            "description": "When set to n, returns items with datetype within the last n days.",
-                        },
-                        "mindate": {
-                            "type": "string",
-                            "description": "Start date for date range. Format: YYYY/MM/DD, YYYY/MM, or YYYY. Must be used with maxdate.",
-                        },
-                        "maxdate": {
-                            "type": "string",
-                            "description": "End date for date range. Format: YYYY/MM/DD, YYYY/MM, or YYYY. Must be used with mindate.",
-                        },
-                    },
-                },
-            }
-        ]
-        return {
-            "jsonrpc": "2.0",
-            "id": request_data.get("id"),
-            "result": {"tools": tools},
-        }
+    return handle
 
-    elif method == "tools/call":
-        params = request_data.get("params", {})
-        tool_name = params.get("name")
-        arguments = params.get("arguments", {})
 
-        if tool_name == "search_abstracts":
-            try:
-                result = search_pubmed_abstracts(arguments)
-            except Exception as e:
-                return {
-                    "jsonrpc": "2.0",
-                    "id": request_data.get("id"),
-                    "error": {
-                        "code": -32603,
-                        "message": f"PubMed search error: {str(e)}",
-                    },
-                }
-        else:
-            return {
-                "jsonrpc": "2.0",
-                "id": request_data.get("id"),
-                "error": {"code": -32601, "message": f"Tool not found: {tool_name}"},
-            }
-
-        return {
-            "jsonrpc": "2.0",
-            "id": request_data.get("id"),
-            "result": {"content": [{"type": "text", "text": result}]},
-        }
+async def _handle_tools_call(req_id, params):
+    """Handle tools/call requests"""
+    tool_name = params.get("name")
+    arguments = params.get("arguments", {})
 
-    elif method == "resources/list":
-        resources = [
-            {
-                "uri": "config://server",
-                "name": "Server Configuration",
-                "description": "PubMed MCP server configuration and status information",
-                "mimeType": "application/json",
-            },
-            {
-                "uri": "help://pubmed",
-                "name": "PubMed Search Help",
-                "description": "Documentation for PubMed search parameters and usage",
-                "mimeType": "text/plain",
-            },
-        ]
-        return {
-            "jsonrpc": "2.0",
-            "id": request_data.get("id"),
-            "result": {"resources": resources},
-        }
+    if tool_name != "search_abstracts":
+        return create_error_response(-32601, f"Tool not found: {tool_name}", req_id)
 
-    elif method == "resources/templates/list":
-        templates = [
-            {
-                "uri": "template://pubmed-search",
-                "name": "PubMed Search Template",
-                "description": "Template for common PubMed search patterns",
-                "mimeType": "application/json",
-            },
-            {
-                "uri": "template://recent-articles",
-                "name": "Recent Articles Template",
-                "description": "Template for finding recent articles on a topic",
-                "mimeType": "application/json",
-            },
-        ]
-        return {
-            "jsonrpc": "2.0",
-            "id": request_data.get("id"),
-            "result": {"templates": templates},
-        }
+    return _stream_text_content(req_id, iter_pubmed_abstracts(arguments))
 
-    elif method == "resources/read":
-        params = request_data.get("params", {})
-        uri = params.get("uri")
-
-        if uri == "config://server":
-            config = {
-                "name": "PubMed MCP Server",
-                "version": "1.0.0",
-                "description": "HTTP-streamable MCP server for PubMed database searches",
-                "capabilities": {
-                    "tools": ["search_abstracts"],
-                    "resources": ["config://server", "help://pubmed"],
-                },
-                "environment": "vercel",
-                "features": ["pubmed_search", "abstract_retrieval", "ncbi_api"],
-            }
-            return {
-                "jsonrpc": "2.0",
-                "id": request_data.get("id"),
-                "result": {
-                    "contents": [
-                        {
-                            "uri": uri,
-                            "mimeType": "application/json",
-                            "text": json.dumps(config, indent=2),
-                        }
-                    ]
-                },
-            }
-        elif uri == "help://pubmed":
-            help_text = """PubMed MCP Server - Search Help
 
-Available Tools:
-- search_abstracts: Search PubMed database for research abstracts
+async def _stream_text_content(req_id, pieces):
+    """Stream a tools/call text result, escaping each piece as it arrives"""
+    yield b"".join((_RESPONSE_HEAD, _dumps(req_id), _TEXT_CONTENT_HEAD, b'"'))
+    async for piece in pieces:
+        # JSON string escaping is per character, so each piece can be escaped
+        # on its own and the surrounding quotes dropped
+        yield _dumps(piece)[1:-1]
+    yield b'"' + _TEXT_CONTENT_TAIL
 
-Search Parameters:
-- term (required): Search query string
-- retmax (optional): Number of results to return (default: 20, max: 10000)
-- sort (optional): Sort method - pub_date, Author, JournalName, relevance
-- field (optional): Search field to limit entire search
-- datetype (optional): Date type - mdat, pdat, edat
-- reldate (optional): Return items from last N days
-- mindate (optional): Start date (YYYY/MM/DD format)
-- maxdate (optional): End date (YYYY/MM/DD format)
 
-Examples:
-- Search for "cancer" articles: {"term": "cancer"}
-- Recent articles: {"term": "diabetes", "reldate": 30}
-- Date range: {"term": "covid", "mindate": "2023/01/01", "maxdate": "2023/12/31"}
-- Sort by date: {"term": "machine learning", "sort": "pub_date"}
+async def _handle_resources_read(req_id, params):
+    """Handle resources/read requests"""
+    uri = params.get("uri")
 
-The server uses NCBI E-utilities API for PubMed searches."""
-            return {
-                "jsonrpc": "2.0",
-                "id": request_data.get("id"),
-                "result": {
-                    "contents": [
-                        {"uri": uri, "mimeType": "text/plain", "text": help_text}
-                    ]
-                },
-            }
-        elif uri == "template://pubmed-search":
-            template = {
-                "name": "PubMed Search Template",
-                "description": "Template for common PubMed search patterns",
-                "arguments": {
-                    "term": {
-                        "type": "string",
-                        "description": "Search term for PubMed",
-                        "required": True,
-                    },
-                    "retmax": {
-                        "type": "integer",
-                        "description": "Number of results (default: 20)",
-                        "default": 20,
-                    },
-                    "sort": {
-                        "type": "string",
-                        "description": "Sort method",
-                        "enum": ["pub_date", "Author", "JournalName", "relevance"],
-                        "default": "relevance",
-                    },
-                },
-                "examples": [
-                    {
-                        "name": "Basic Search",
-                        "arguments": {"term": "cancer treatment", "retmax": 10},
-                    },
-                    {
-                        "name": "Recent Articles",
-                        "arguments": {
-                            "term": "machine learning",
-                            "sort": "pub_date",
-                            "retmax": 5,
-                        },
-                    },
-                ],
-            }
-            return {
-                "jsonrpc": "2.0",
-                "id": request_data.get("id"),
-                "result": {
-                    "contents": [
-                        {
-                            "uri": uri,
-                            "mimeType": "application/json",
-                            "text": json.dumps(template, indent=2),
-                        }
-                    ]
-                },
-            }
-        elif uri == "template://recent-articles":
-            template = {
-                "name": "Recent Articles Template",
-                "description": "Template for finding recent articles on a topic",
-                "arguments": {
-                    "term": {
-                        "type": "string",
-                        "description": "Search term for recent articles",
-                        "required": True,
-                    },
-                    "reldate": {
-                        "type": "integer",
-                        "description": "Days back to search (default: 30)",
-                        "default": 30,
-                    },
-                    "retmax": {
-                        "type": "integer",
-                        "description": "Number of results (default: 10)",
-                        "default": 10,
-                    },
-                },
-                "examples": [
-                    {
-                        "name": "Last 7 Days",
-                        "arguments": {"term": "covid-19", "reldate": 7, "retmax": 5},
-                    },
-                    {
-                        "name": "Last Month",
-                        "arguments": {
-                            "term": "artificial intelligence",
-                            "reldate": 30,
-                            "retmax": 20,
-                        },
-                    },
-                ],
-            }
-            return {
-                "jsonrpc": "2.0",
-                "id": request_data.get("id"),
-                "result": {
-                    "contents": [
-                        {
-                            "uri": uri,
-                            "mimeType": "application/json",
-                            "text": json.dumps(template, indent=2),
-                        }
-                    ]
-                },
-            }
-        else:
-            return {
-                "jsonrpc": "2.0",
-                "id": request_data.get("id"),
-                "error": {"code": -32601, "message": f"Resource not found: {uri}"},
-            }
-
-    else:
-        return {
-            "jsonrpc": "2.0",
-            "id": request_data.get("id"),
-            "error": {"code": -32601, "message": f"Method not found: {method}"},
-        }
+    tail = _STATIC_RESOURCES.get(uri)
+    if tail is None:
+        return create_error_response(-32601, f"Resource not found: {uri}", req_id)
+
+    return _static_response(req_id, tail)
+
+
+_METHODS = {
+    **{method: _static_handler(tail) for method, tail in _STATIC_RESULTS.items()},
+    "tools/call": _handle_tools_call,
+    "resources/read": _handle_resources_read,
+}
+
+
+async def handle_mcp_request(request_data):
+    """Handle MCP protocol requests and return the serialized response
+
+    The response is either bytes or, for tool calls, an async iterator of
+    bytes that produces the body incrementally.
+    """
+    # JSON-RPC batches are answered with an array of responses; their calls
+    # run concurrently so the NCBI round trips of several searches overlap
+    if isinstance(request_data, list):
+        if not request_data:
+            return create_error_response(-32600, "Invalid Request: Empty batch")
+
+        responses = await asyncio.gather(
+            *(_handle_batch_item(item) for item in request_data)
+        )
+        return b"".join((b"[", b",".join(responses), b"]"))
+
+    return await _handle_single_request(request_data)
+
+
+async def _handle_batch_item(request_data):
+    """Handle one request of a batch, buffering a streamed response"""
+    # A failing item is answered with its own error, like a single request
+    # would be, instead of failing the gather and with it the whole batch
+    try:
+        response = await _handle_single_request(request_data)
+        if isinstance(response, bytes):
+            return response
+        return b"".join([chunk async for chunk in response])
+    except Exception as e:
+        req_id = request_data.get("id") if isinstance(request_data, dict) else None
+        return create_error_response(-32603, f"Internal error: {str(e)}", req_id)
+
+
+async def _handle_single_request(request_data):
+    """Handle a single JSON-RPC request object"""
+    # Validate request structure
+    if not isinstance(request_data, dict):
+        return create_error_response(-32700, "Parse error: Invalid JSON")
+
+    req_id = request_data.get("id")
+
+    if request_data.get("jsonrpc") != "2.0":
+        return create_error_response(
+            -32600, "Invalid Request: Missing or invalid jsonrpc field", req_id
+        )
+
+    method = request_data.get("method")
+    method_handler = _METHODS.get(method)
+    if method_handler is None:
+        return create_error_response(-32601, f"Method not found: {method}", req_id)
+
+    return await method_handler(req_id, request_data.get("params") or {})
 
 
 def create_error_response(code, message, request_id=None):
-    """Create a properly formatted JSON-RPC error response"""
-    return {
-        "jsonrpc": "2.0",
-        "id": request_id,
-        "error": {"code": code, "message": message},
-    }
+    """Create a properly formatted, serialized JSON-RPC error response"""
+    # Shares the pre-serialized envelope head with the static responses, so
+    # only the error object itself is built per call
+    return b"".join(
+        (
+            _RESPONSE_HEAD,
+            _dumps(request_id),
+            b',"error":',
+            _dumps({"code": code, "message": message}),
+            b"}",
+        )
+    )
+
+
+def _search_cache_get(key):
+    """Return the cached search result for key, or None if missing or expired"""
+    entry = _search_cache.get(key)
+    if entry is None:
+        return None
+
+    stored_at, result = entry
+    if time.monotonic() - stored_at > SEARCH_CACHE_TTL:
+        del _search_cache[key]
+        return None
+
+    _search_cache.move_to_end(key)
+    return result
+
+
+def _search_cache_put(key, result):
+    """Store a search result, evicting the least recently used entry when full"""
+    _search_cache[key] = (time.monotonic(), result)
+    _search_cache.move_to_end(key)
+    if len(_search_cache) > SEARCH_CACHE_SIZE:
+        _search_cache.popitem(last=False)
+
+
+def parse_esearch_ids(content):
+    """Extract the ID list from an ESearch JSON body, or None if it has none"""
+    # The ESearch payload is NCBI-controlled, so the ID list can be picked out
+    # without building the full parsed tree; anything unexpected goes through
+    # the JSON parser instead
+    match = _IDLIST_RE.search(content)
+    if match is not None:
+        return _ID_RE.findall(match.group(1).decode("utf-8"))
+
+    esearch_data = _loads(content)
+    if (
+        "esearchresult" not in esearch_data
+        or "idlist" not in esearch_data["esearchresult"]
+    ):
+        return None
+
+    return esearch_data["esearchresult"]["idlist"]
+
+
+async def _ncbi_pace():
+    """Wait for the next request slot allowed by NCBI_RATE_LIMIT"""
+    global _ncbi_next_request
+    # The slot is reserved before sleeping, so concurrent callers queue up
+    # one interval apart instead of all waking at the same moment
+    now = time.monotonic()
+    slot = max(now, _ncbi_next_request)
+    _ncbi_next_request = slot + 1.0 / NCBI_RATE_LIMIT
+    if slot > now:
+        await asyncio.sleep(slot - now)
+
+
+async def ncbi_get(url):
+    """GET an E-utilities URL and return the response body
+
+    Requests are paced and capped at NCBI's rate limit, and rate-limited,
+    server error and transport failures are retried with jittered exponential
+    backoff.
+    """
+    client, semaphore = _get_client()
+    async with semaphore:
+        for attempt in range(NCBI_MAX_ATTEMPTS):
+            last_attempt = attempt == NCBI_MAX_ATTEMPTS - 1
+            await _ncbi_pace()
+            try:
+                response = await client.get(url)
+            except httpx.TransportError:
+                if last_attempt:
+                    raise
+            else:
+                if last_attempt or (
+                    response.status_code != 429 and response.status_code < 500
+                ):
+                    response.raise_for_status()
+                    return response.content
 
+            await asyncio.sleep(NCBI_RETRY_BACKOFF * 2**attempt + random.random() * 0.1)
 
-def search_pubmed_abstracts(arguments):
-    """Search PubMed abstracts using NCBI E-utilities API"""
+
+async def fetch_pubmed_abstracts(ids):
+    """Fetch the raw text abstracts for a batch of PubMed IDs"""
+    return await ncbi_get(f"{EFETCH_URL}&id={quote_plus(','.join(ids), ',')}")
+
+
+def describe_ncbi_error(e):
+    """Describe a failed E-utilities call for the client
+
+    HTTP status errors are reduced to the status line: their message includes
+    the request URL, which carries NCBI_API_KEY.
+    """
+    if isinstance(e, httpx.HTTPStatusError):
+        return f"NCBI returned HTTP {e.response.status_code} {e.response.reason_phrase}"
+    return str(e)
+
+
+async def iter_pubmed_abstracts(arguments):
+    """Search PubMed abstracts using NCBI E-utilities API, yielding the text in
+    pieces as soon as each EFetch batch arrives"""
+    pieces = []
     try:
         # Extract parameters
         term = arguments.get("term", "")
         retmax = arguments.get("retmax", 20)
-        sort = arguments.get("sort", "")
-        field = arguments.get("field", "")
-        datetype = arguments.get("datetype", "")
-        reldate = arguments.get("reldate", "")
-        mindate = arguments.get("mindate", "")
-        maxdate = arguments.get("maxdate", "")
+        optional = tuple(arguments.get(key, "") for key in ESEARCH_OPTIONAL_PARAMS)
 
         if not term:
-            return "Error: Search term is required"
+            yield "Error: Search term is required"
+            return
 
-        # Build ESearch URL
-        esearch_params = {
-            "db": "pubmed",
-            "term": term,
-            "retmax": retmax,
-            "retmode": "json",
-            "usehistory": "y",
-        }
+        # Keyed on the values as they are sent to NCBI, so arguments that are
+        # not hashable (e.g. a list) still make a valid key
+        cache_key = tuple(str(value) for value in (term, retmax, *optional))
+        cached = _search_cache_get(cache_key)
+        if cached is not None:
+            yield cached
+            return
 
-        if sort:
-            esearch_params["sort"] = sort
-        if field:
-            esearch_params["field"] = field
-        if datetype:
-            esearch_params["datetype"] = datetype
-        if reldate:
-            esearch_params["reldate"] = reldate
-        if mindate:
-            esearch_params["mindate"] = mindate
-        if maxdate:
-            esearch_params["maxdate"] = maxdate
-
-        esearch_url = (
-            "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esearch.fcgi?"
-            + urllib.parse.urlencode(esearch_params)
+        # Build ESearch URL
+        esearch_url = "".join(
+            [
+                ESEARCH_URL,
+                "&term=",
+                quote_plus(str(term)),
+                "&retmax=",
+                quote_plus(str(retmax)),
+                *(
+                    f"&{key}={quote_plus(str(value))}"
+                    for key, value in zip(ESEARCH_OPTIONAL_PARAMS, optional)
+                    if value
+                ),
+            ]
         )
 
         # Perform search
-        with urllib.request.urlopen(esearch_url) as response:
-            esearch_data = json.loads(response.read().decode())
+        ids = parse_esearch_ids(await ncbi_get(esearch_url))
+        if ids is None:
+            yield "No articles found matching the search criteria."
+            return
 
-        if (
-            "esearchresult" not in esearch_data
-            or "idlist" not in esearch_data["esearchresult"]
-        ):
-            return "No articles found matching the search criteria."
-
-        ids = esearch_data["esearchresult"]["idlist"]
         if not ids:
-            return "No articles found matching the search criteria."
-
-        # Build EFetch URL
-        efetch_params = {
-            "db": "pubmed",
-            "id": ",".join(ids),
-            "retmode": "text",
-            "rettype": "abstract",
-        }
-
-        efetch_url = (
-            "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/efetch.fcgi?"
-            + urllib.parse.urlencode(efetch_params)
-        )
-
-        # Fetch abstracts
-        with urllib.request.urlopen(efetch_url) as response:
-            abstracts = response.read().decode()
-
-        return abstracts
+            result = "No articles found matching the search criteria."
+            _search_cache_put(cache_key, result)
+            yield result
+            return
+
+        # Fetch abstracts in fixed-size batches concurrently, but hand them out
+        # in order as soon as each one is in rather than waiting for all
+        batches = [
+            ids[i : i + EFETCH_BATCH_SIZE]
+            for i in range(0, len(ids), EFETCH_BATCH_SIZE)
+        ]
+        tasks = [
+            asyncio.ensure_future(fetch_pubmed_abstracts(batch)) for batch in batches
+        ]
+        try:
+            for task in tasks:
+                piece = (await task).decode("utf-8")
+                if pieces:
+                    piece = "\n" + piece
+                pieces.append(piece)
+                yield piece
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        _search_cache_put(cache_key, "".join(pieces))
 
     except Exception as e:
-        return f"Error searching PubMed: {str(e)}"
+        # Some abstracts may already have been handed out by this point
+        separator = "\n" if pieces else ""
+        yield f"{separator}Error searching PubMed: {describe_ncbi_error(e)}"
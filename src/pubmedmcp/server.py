@@ -1,16 +1,22 @@
+import asyncio
 import contextlib
 import logging
 import os
+import time
+from collections import OrderedDict
 from collections.abc import AsyncIterator
 from typing import Any, Literal, Optional
+from urllib.parse import urlencode
 
 import click
+import httpx
+import jsonschema
 import mcp.types as types
 from mcp.server.lowlevel import Server
 from mcp.server.streamable_http_manager import StreamableHTTPSessionManager
-from pubmedclient.models import Db, EFetchRequest, ESearchRequest
-from pubmedclient.sdk import efetch, esearch, pubmedclient_client
-from pydantic import BaseModel, Field
+from pubmedclient.models import Db, ESearchRequest
+from pubmedclient.sdk import BASE_URL, esearch
+from pydantic import BaseModel, ConfigDict, Field, ValidationError
 from starlette.applications import Starlette
 from starlette.middleware.cors import CORSMiddleware
 from starlette.routing import Mount
@@ -18,6 +24,69 @@ from starlette.types import Receive, Scope, Send
 
 logger = logging.getLogger(__name__)
 
+# Read once at import; create_app() uses it unless given another level
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# NCBI asks clients to identify themselves with the tool and email query
+# parameters, and an API key raises its rate limit from 3 to 10 requests per
+# second. All three are sent as default query parameters on every E-utilities
+# request, the same way as by the Vercel handler in api/index.py.
+NCBI_API_KEY = os.getenv("NCBI_API_KEY")
+NCBI_EMAIL = os.getenv("NCBI_EMAIL")
+NCBI_PARAMS = {
+    key: value
+    for key, value in {
+        "tool": "pubmedmcp",
+        "email": NCBI_EMAIL,
+        "api_key": NCBI_API_KEY,
+    }.items()
+    if value
+}
+NCBI_RATE_LIMIT = 10.0 if NCBI_API_KEY else 3.0
+
+# Connection pool shared by all tool calls for the lifetime of the server
+NCBI_LIMITS = httpx.Limits(max_keepalive_connections=20, max_connections=50)
+
+# Number of PMIDs requested per EFetch call; larger result sets are split into
+# batches fetched concurrently
+EFETCH_BATCH_SIZE = 200
+
+# EFetch is called with POST, as NCBI recommends for long id lists. The
+# constant part of the form body is encoded once and the ids are appended.
+EFETCH_URL = f"{BASE_URL}/efetch.fcgi"
+EFETCH_FORM_PREFIX = (
+    urlencode({"db": Db.PUBMED.value, "retmode": "text", "rettype": "abstract"})
+    + "&id="
+).encode()
+EFETCH_FORM_HEADERS = {"Content-Type": "application/x-www-form-urlencoded"}
+
+# Validated once at import so that enum defaults (db, retmode) are already
+# converted to their plain values; per-request copies skip validation
+ESEARCH_TEMPLATE = ESearchRequest(db=Db.PUBMED, term="")
+
+# LRU cache of recent search results, keyed on the validated request. Entries
+# expire after SEARCH_CACHE_TTL seconds so new publications still show up.
+SEARCH_CACHE_SIZE = 512
+SEARCH_CACHE_TTL = 600.0
+
+# Argument descriptions shared by SearchAbstractsRequest and the tool input
+# schema, so both stay in sync
+TERM_DESCRIPTION = "Entrez text query. All special characters must be URL encoded. Spaces may be replaced by '+' signs."
+RETMAX_DESCRIPTION = "Number of UIDs to return (default=20, max=10000)."
+SORT_DESCRIPTION = (
+    "Sort method for results. Options: pub_date, Author, JournalName, relevance"
+)
+FIELD_DESCRIPTION = (
+    "Search field to limit entire search. Equivalent to adding [field] to term."
+)
+DATETYPE_DESCRIPTION = "Type of date used to limit search: mdat (modification date), pdat (publication date), edat (Entrez date)"
+RELDATE_DESCRIPTION = (
+    "When set to n, returns items with datetype within the last n days."
+)
+MINDATE_DESCRIPTION = "Start date for date range. Format: YYYY/MM/DD, YYYY/MM, or YYYY. Must be used with maxdate."
+MAXDATE_DESCRIPTION = "End date for date range. Format: YYYY/MM/DD, YYYY/MM, or YYYY. Must be used with mindate."
+
 
 class SearchAbstractsRequest(BaseModel):
     """
@@ -53,140 +122,366 @@ class SearchAbstractsRequest(BaseModel):
         ... )
     """
 
+    model_config = ConfigDict(frozen=True)
+
     term: str = Field(
         ...,
-        description="""Entrez text query. All special characters must be URL encoded. 
-        Spaces may be replaced by '+' signs. For very long queries (more than several 
-        hundred characters), consider using an HTTP POST call. See PubMed or Entrez 
-        help for information about search field descriptions and tags. Search fields 
-        and tags are database specific.""",
+        description=TERM_DESCRIPTION,
     )
 
     retmax: Optional[int] = Field(
         20,
-        description="""Number of UIDs to return (default=20, max=10000).""",
+        description=RETMAX_DESCRIPTION,
     )
 
     sort: Optional[str] = Field(
         None,
-        description="""Sort method for results. PubMed values:
-        - pub_date: descending sort by publication date
-        - Author: ascending sort by first author
-        - JournalName: ascending sort by journal name
-        - relevance: default sort order ("Best Match")""",
+        description=SORT_DESCRIPTION,
     )
     field: Optional[str] = Field(
         None,
-        description="""Search field to limit entire search. Equivalent to adding [field] 
-        to term.""",
+        description=FIELD_DESCRIPTION,
     )
     datetype: Optional[Literal["mdat", "pdat", "edat"]] = Field(
         None,
-        description="""Type of date used to limit search:
-        - mdat: modification date
-        - pdat: publication date
-        - edat: Entrez date
-        Generally databases have only two allowed values.""",
+        description=DATETYPE_DESCRIPTION,
     )
     reldate: Optional[int] = Field(
         None,
-        description="""When set to n, returns items with datetype within the last n 
-        days.""",
+        description=RELDATE_DESCRIPTION,
     )
     mindate: Optional[str] = Field(
         None,
-        description="""Start date for date range. Format: YYYY/MM/DD, YYYY/MM, or YYYY. 
-        Must be used with maxdate.""",
+        description=MINDATE_DESCRIPTION,
     )
     maxdate: Optional[str] = Field(
         None,
-        description="""End date for date range. Format: YYYY/MM/DD, YYYY/MM, or YYYY. 
-        Must be used with mindate.""",
+        description=MAXDATE_DESCRIPTION,
     )
 
 
-def create_app(json_response: bool = False) -> Starlette:
+# Tools exposed by the server, built once at import since they never change
+TOOLS: list[types.Tool] = [
+    types.Tool(
+        name="search_abstracts",
+        description="Search abstracts on PubMed database based on the request parameters. Returns formatted text containing article titles, abstracts, authors, journal names, publication dates, DOIs, and PMIDs.",
+        inputSchema={
+            "type": "object",
+            "required": ["term"],
+            "properties": {
+                "term": {
+                    "type": "string",
+                    "description": TERM_DESCRIPTION,
+                },
+                "retmax": {
+                    "type": "integer",
+                    "description": RETMAX_DESCRIPTION,
+                    "default": 20,
+                },
+                "sort": {
+                    "type": "string",
+                    "description": SORT_DESCRIPTION,
+                    "enum": ["pub_date", "Author", "JournalName", "relevance"],
+                },
+                "field": {
+                    "type": "string",
+                    "description": FIELD_DESCRIPTION,
+                },
+                "datetype": {
+                    "type": "string",
+                    "description": DATETYPE_DESCRIPTION,
+                    "enum": ["mdat", "pdat", "edat"],
+                },
+                "reldate": {
+                    "type": "integer",
+                    "description": RELDATE_DESCRIPTION,
+                },
+                "mindate": {
+                    "type": "string",
+                    "description": MINDATE_DESCRIPTION,
+                },
+                "maxdate": {
+                    "type": "string",
+                    "description": MAXDATE_DESCRIPTION,
+                },
+            },
+        },
+    ),
+]
+
+
+# Content blocks are only ever built from strings, so they are created with
+# model_construct() and skip pydantic validation
+NO_RESULTS: list[types.ContentBlock] = [
+    types.TextContent.model_construct(
+        type="text", text="No articles found matching the search criteria."
+    )
+]
+
+# Compiled once at import: the MCP server's built-in input validation checks the
+# schema and builds a new validator on every call, so it is disabled in favor
+# of this one. Arguments are not coerced after validation, so "integer" only
+# accepts real ints; by default jsonschema also accepts integral floats such
+# as 5.0, which would reach NCBI as "5.0".
+SearchAbstractsValidator = jsonschema.validators.extend(
+    jsonschema.Draft202012Validator,
+    type_checker=jsonschema.Draft202012Validator.TYPE_CHECKER.redefine(
+        "integer",
+        lambda checker, instance: (
+            isinstance(instance, int) and not isinstance(instance, bool)
+        ),
+    ),
+)
+SEARCH_ABSTRACTS_VALIDATOR = SearchAbstractsValidator(TOOLS[0].inputSchema)
+
+
+class TokenBucket:
+    """Asyncio token bucket spacing out requests to a fixed rate per second.
+
+    The bucket holds a single token, so requests are never sent in a burst
+    faster than the rate; a burst would exceed NCBI's per-second limit.
+    """
+
+    def __init__(self, rate: float) -> None:
+        self.rate = rate
+        self._tokens = 1.0
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        """Wait until a request may be sent and take its token."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(
+                    1.0, self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                await asyncio.sleep((1.0 - self._tokens) / self.rate)
+
+    async def __call__(self, request: httpx.Request) -> None:
+        """httpx request hook, so every request sent by a client is limited."""
+        await self.acquire()
+
+
+# Failures of an NCBI round trip that are reported back to the client as the
+# tool result: transport and HTTP status errors, and ESearch responses that do
+# not parse. Anything else is a bug and propagates to the MCP server.
+NCBI_ERRORS = (httpx.HTTPError, ValidationError)
+
+
+def describe_ncbi_error(e: Exception) -> str:
+    """Describe a failed NCBI round trip without leaking the API key.
+
+    The message of an httpx.HTTPStatusError contains the request URL, which
+    carries the api_key query parameter, so it is rebuilt from the status
+    line and the URL with the key removed. A ValidationError is reduced to
+    its first error, without the offending part of the NCBI payload.
+    """
+    if isinstance(e, httpx.HTTPStatusError):
+        url = e.request.url.copy_remove_param("api_key")
+        return (
+            f"NCBI returned HTTP {e.response.status_code} "
+            f"{e.response.reason_phrase} for {url}"
+        )
+    if isinstance(e, ValidationError):
+        error = e.errors(include_url=False, include_input=False)[0]
+        location = ".".join(map(str, error["loc"]))
+        message = f"{location}: {error['msg']}" if location else error["msg"]
+        return f"unexpected ESearch response: {message}"
+    return str(e)
+
+
+def redact_api_key(record: logging.LogRecord) -> bool:
+    """Logging filter removing the api_key parameter from logged httpx URLs."""
+    if isinstance(record.args, tuple):
+        record.args = tuple(
+            arg.copy_remove_param("api_key") if isinstance(arg, httpx.URL) else arg
+            for arg in record.args
+        )
+    return True
+
+
+# httpx logs the URL of every request at INFO, which would include the key
+logging.getLogger("httpx").addFilter(redact_api_key)
+
+
+def search_error(e: Exception) -> list[types.ContentBlock]:
+    """Log a failed NCBI round trip and build the tool result reporting it."""
+    description = describe_ncbi_error(e)
+    logger.error("Error searching PubMed: %s", description)
+    return [
+        types.TextContent.model_construct(
+            type="text",
+            text=f"Error searching PubMed: {description}",
+        )
+    ]
+
+
+async def efetch_abstracts(client: httpx.AsyncClient, ids: list[str]) -> str:
+    """POST one EFetch call for ids and return the text abstracts."""
+    response = await client.post(
+        EFETCH_URL,
+        content=EFETCH_FORM_PREFIX + ",".join(ids).encode(),
+        headers=EFETCH_FORM_HEADERS,
+    )
+    response.raise_for_status()
+    return response.text
+
+
+async def fetch_abstracts(client: httpx.AsyncClient, ids: list[str]) -> list[str]:
+    """Fetch the text abstracts of ids, one concurrent EFetch call per batch.
+
+    The batch texts are returned in order and are not joined, so a large
+    result set is never copied into one more string.
+    """
+    try:
+        async with asyncio.TaskGroup() as tg:
+            tasks = [
+                tg.create_task(efetch_abstracts(client, ids[i : i + EFETCH_BATCH_SIZE]))
+                for i in range(0, len(ids), EFETCH_BATCH_SIZE)
+            ]
+    except ExceptionGroup as eg:
+        # Surface the first failing batch rather than the group wrapper
+        raise eg.exceptions[0]
+
+    return [task.result() for task in tasks]
+
+
+_search_cache: OrderedDict[
+    SearchAbstractsRequest, tuple[float, list[types.ContentBlock]]
+] = OrderedDict()
+
+
+def search_cache_get(
+    request: SearchAbstractsRequest,
+) -> list[types.ContentBlock] | None:
+    """Return the cached result for request, or None if missing or expired."""
+    entry = _search_cache.get(request)
+    if entry is None:
+        return None
+
+    stored_at, result = entry
+    if time.monotonic() - stored_at > SEARCH_CACHE_TTL:
+        del _search_cache[request]
+        return None
+
+    _search_cache.move_to_end(request)
+    return result
+
+
+def search_cache_put(
+    request: SearchAbstractsRequest, result: list[types.ContentBlock]
+) -> None:
+    """Store a result, evicting the least recently used entry when full."""
+    _search_cache[request] = (time.monotonic(), result)
+    _search_cache.move_to_end(request)
+    if len(_search_cache) > SEARCH_CACHE_SIZE:
+        _search_cache.popitem(last=False)
+
+
+def create_app(json_response: bool = False, log_level: str = LOG_LEVEL) -> Starlette:
     """Create the ASGI application for Vercel deployment."""
-    # Configure logging
-    log_level = os.getenv("LOG_LEVEL", "INFO")
+    # Configure logging. This stays here rather than at import so that the
+    # --log-level option of main() is applied; basicConfig() only configures
+    # the root logger the first time it is called.
     logging.basicConfig(
-        level=getattr(logging, log_level.upper()),
-        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        level=logging.getLevelNamesMapping().get(log_level.upper(), logging.INFO),
+        format=LOG_FORMAT,
     )
-
     app = Server("PubMedMCP")
 
-    @app.call_tool()
+    # HTTP client opened once in the lifespan and reused by every tool call,
+    # so searches run over warm keep-alive connections
+    client: httpx.AsyncClient | None = None
+
+    async def search_abstracts(
+        request: SearchAbstractsRequest,
+    ) -> list[types.ContentBlock]:
+        """Run a validated search_abstracts request against NCBI."""
+        # Identical searches within the TTL are answered without calling
+        # NCBI; the request model is frozen and therefore hashable
+        cached = search_cache_get(request)
+        if cached is not None:
+            return cached
+
+        # Perform the PubMed search and get the ids; the arguments were
+        # validated against the input schema already, so they are copied
+        # onto the template without a second validation pass
+        search_request = ESEARCH_TEMPLATE.model_copy(update=request.__dict__)
+        try:
+            search_response = await esearch(client, search_request)
+        except NCBI_ERRORS as e:
+            return search_error(e)
+        ids = search_response.esearchresult.idlist
+
+        if not ids:
+            search_cache_put(request, NO_RESULTS)
+            return NO_RESULTS
+
+        # get the abstracts of each ids
+        # in practice it returns something like the following:
+        #
+        # 1. Allergy Asthma Proc. 2025 Jan 1;46(1):1-3. doi: 10.2500/aap.2025.46.240102.
+        #
+        # Exploring mast cell disorders: Tryptases, hereditary alpha-tryptasemia, and MCAS
+        # treatment approaches.
+        # Bellanti JA, Settipane RA.
+        # DOI: 10.2500/aap.2025.46.240102
+        # PMID: 39741377
+        #
+        # 2. ...
+        try:
+            fetch_responses = await fetch_abstracts(client, ids)
+        except NCBI_ERRORS as e:
+            return search_error(e)
+
+        # one content block per EFetch batch
+        result = [
+            types.TextContent.model_construct(
+                type="text",
+                text=fetch_response,
+            )
+            for fetch_response in fetch_responses
+        ]
+        search_cache_put(request, result)
+        return result
+
+    @app.call_tool(validate_input=False)
     async def call_tool(
         name: str, arguments: dict[str, Any]
     ) -> list[types.ContentBlock]:
         if name == "search_abstracts":
-            # Parse the request arguments
-            try:
-                request = SearchAbstractsRequest(**arguments)
-            except Exception as e:
-                return [
-                    types.TextContent(
-                        type="text",
-                        text=f"Error parsing request parameters: {str(e)}",
-                    )
-                ]
+            # Validate the request arguments against the tool input schema.
+            # Only the first error is reported, so validation stops there
+            # instead of collecting and ranking every error.
+            error = next(SEARCH_ABSTRACTS_VALIDATOR.iter_errors(arguments), None)
+            if error is not None:
+                # Raised so that the MCP server reports an isError result,
+                # like its own input validation would; the failing argument
+                # is named when there is one
+                location = ".".join(map(str, error.absolute_path))
+                message = f"{location}: {error.message}" if location else error.message
+                raise ValueError(f"Input validation error: {message}")
+
+            # The arguments match the schema, so the model is built without
+            # running pydantic validation a second time
+            request = SearchAbstractsRequest.model_construct(**arguments)
 
             try:
-                # Perform the PubMed search
-                async with pubmedclient_client() as client:
-                    # perform a search and get the ids
-                    search_request = ESearchRequest(
-                        db=Db.PUBMED, **request.model_dump()
-                    )
-                    search_response = await esearch(client, search_request)
-                    ids = search_response.esearchresult.idlist
-
-                    if not ids:
-                        return [
-                            types.TextContent(
-                                type="text",
-                                text="No articles found matching the search criteria.",
-                            )
-                        ]
-
-                    # get the abstracts of each ids
-                    # in practice it returns something like the following:
-                    #
-                    # 1. Allergy Asthma Proc. 2025 Jan 1;46(1):1-3. doi: 10.2500/aap.2025.46.240102.
-                    #
-                    # Exploring mast cell disorders: Tryptases, hereditary alpha-tryptasemia, and MCAS
-                    # treatment approaches.
-                    # Bellanti JA, Settipane RA.
-                    # DOI: 10.2500/aap.2025.46.240102
-                    # PMID: 39741377
-                    #
-                    # 2. ...
-                    fetch_request = EFetchRequest(
-                        db=Db.PUBMED,
-                        id=",".join(ids),
-                        retmode="text",
-                        rettype="abstract",
-                    )
-                    fetch_response = await efetch(client, fetch_request)
-
-                    return [
-                        types.TextContent(
-                            type="text",
-                            text=fetch_response,
-                        )
-                    ]
-            except Exception as e:
-                logger.error(f"Error searching PubMed: {str(e)}")
-                return [
-                    types.TextContent(
-                        type="text",
-                        text=f"Error searching PubMed: {str(e)}",
-                    )
-                ]
+                return await search_abstracts(request)
+            except Exception:
+                # NCBI failures are answered inside search_abstracts(), so
+                # anything reaching here is a bug. The MCP server turns it
+                # into an isError result without logging it.
+                logger.exception("Unexpected error searching PubMed")
+                raise
         else:
             return [
-                types.TextContent(
+                types.TextContent.model_construct(
                     type="text",
                     text=f"Unknown tool: {name}",
                 )
@@ -194,53 +489,7 @@ def create_app(json_response: bool = False) -> Starlette:
 
     @app.list_tools()
     async def list_tools() -> list[types.Tool]:
-        return [
-            types.Tool(
-                name="search_abstracts",
-                description="Search abstracts on PubMed database based on the request parameters. Returns formatted text containing article titles, abstracts, authors, journal names, publication dates, DOIs, and PMIDs.",
-                inputSchema={
-                    "type": "object",
-                    "required": ["term"],
-                    "properties": {
-                        "term": {
-                            "type": "string",
-                            "description": "Entrez text query. All special characters must be URL encoded. Spaces may be replaced by '+' signs.",
-                        },
-                        "retmax": {
-                            "type": "integer",
-                            "description": "Number of UIDs to return (default=20, max=10000).",
-                            "default": 20,
-                        },
-                        "sort": {
-                            "type": "string",
-                            "description": "Sort method for results. Options: pub_date, Author, JournalName, relevance",
-                            "enum": ["pub_date", "Author", "JournalName", "relevance"],
-                        },
-                        "field": {
-                            "type": "string",
-                            "description": "Search field to limit entire search. Equivalent to adding [field] to term.",
-                        },
-                        "datetype": {
-                            "type": "string",
-                            "description": "Type of date used to limit search: mdat (modification date), pdat (publication date), edat (Entrez date)",
-                            "enum": ["mdat", "pdat", "edat"],
-                        },
-                        "reldate": {
-                            "type": "integer",
-                            "description": "When set to n, returns items with datetype within the last n days.",
-                        },
-                        "mindate": {
-                            "type": "string",
-                            "description": "Start date for date range. Format: YYYY/MM/DD, YYYY/MM, or YYYY. Must be used with maxdate.",
-                        },
-                        "maxdate": {
-                            "type": "string",
-                            "description": "End date for date range. Format: YYYY/MM/DD, YYYY/MM, or YYYY. Must be used with mindate.",
-                        },
-                    },
-                },
-            )
-        ]
+        return TOOLS
 
     # Create the session manager with true stateless mode
     session_manager = StreamableHTTPSessionManager(
@@ -257,13 +506,24 @@ def create_app(json_response: bool = False) -> Starlette:
 
     @contextlib.asynccontextmanager
     async def lifespan(app: Starlette) -> AsyncIterator[None]:
-        """Context manager for session manager."""
-        async with session_manager.run():
+        """Context manager for session manager and the shared HTTP client."""
+        nonlocal client
+        # Every ESearch and EFetch call goes through this client, so its
+        # request hook keeps the whole server within NCBI's rate limit
+        async with (
+            httpx.AsyncClient(
+                params=NCBI_PARAMS,
+                limits=NCBI_LIMITS,
+                event_hooks={"request": [TokenBucket(NCBI_RATE_LIMIT)]},
+            ) as client,
+            session_manager.run(),
+        ):
             logger.info("PubMedMCP server started with StreamableHTTP session manager!")
             try:
                 yield
             finally:
                 logger.info("PubMedMCP server shutting down...")
+                client = None
 
     # Create an ASGI application using the transport
     starlette_app = Starlette(
@@ -305,14 +565,23 @@ def main(
     json_response: bool,
 ) -> int:
     """Main function for local development."""
-    # Set environment variable for logging
-    os.environ["LOG_LEVEL"] = log_level
+    # This process only logs with LOG_FORMAT and uvicorn's formats, neither of
+    # which uses the thread, process or multiprocessing fields, so LogRecord
+    # creation skips looking them up. Left alone in create_app(), whose host
+    # may have configured logging formats that need them.
+    logging.logThreads = False
+    logging.logProcesses = False
+    logging.logMultiprocessing = False
 
     # Create the app
-    starlette_app = create_app(json_response)
+    starlette_app = create_app(json_response, log_level)
 
     import uvicorn
 
+    # uvicorn runs on uvloop and httptools whenever they are importable, so
+    # declaring them as dependencies is what enables them; it falls back to
+    # asyncio and h11 where they are unavailable (uvloop does not support
+    # Windows)
     uvicorn.run(starlette_app, host="127.0.0.1", port=port)
 
     return 0